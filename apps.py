@@ -1,9 +1,17 @@
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import ParserRejectedMarkup
 import os
+import heapq
+import hashlib
+import tempfile
 from datetime import datetime, timedelta
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ============ PAGE CONFIG ============
 st.set_page_config(page_title="Delhi Courts Cause List Downloader", layout="wide")
@@ -20,6 +28,51 @@ headers = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 }
 
+@st.cache_resource
+def get_session():
+    """Shared HTTP session"""
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount("https://", HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    ))
+    return session
+
+SESSION = get_session()
+
+# Prefer the C-backed lxml parser, fall back to the stdlib one if missing
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Precompiled patterns used per link / per judge
+PDF_HREF_RE = re.compile(r'\.pdf', re.I)
+SAFE_NAME_RE = re.compile(r'[^\w\s-]')
+
+# Only build anchor tags when parsing the cause list index page
+ONLY_A = SoupStrainer('a', href=True)
+
+@st.cache_resource
+def get_index_cache():
+    """Shared index page cache"""
+    return {}, threading.Lock()
+
+INDEX_CACHE, INDEX_CACHE_LOCK = get_index_cache()
+
+# Parallel PDF downloads (kept small to avoid hammering the court server)
+MAX_DOWNLOAD_WORKERS = 8
+
+@st.cache_resource
+def get_download_slots():
+    """Shared download limit"""
+    return threading.BoundedSemaphore(MAX_DOWNLOAD_WORKERS)
+
+DOWNLOAD_SLOTS = get_download_slots()
+
 # Delhi Court Complexes (Manually added based on Delhi courts structure)
 DELHI_COURTS = {
     "Patiala House Court Complex": "patiala-house",
@@ -31,62 +84,111 @@ DELHI_COURTS = {
 
 # ============ FUNCTIONS ============
 
-def safe_request(url, timeout=10):
+def safe_request(url, timeout=10, stream=False, extra_headers=None):
     """Safe HTTP request"""
     try:
-        response = requests.get(url, headers=headers, timeout=timeout)
+        response = SESSION.get(url, timeout=timeout, stream=stream, headers=extra_headers)
         response.raise_for_status()
         return response
-    except:
+    except requests.RequestException:
+        # Includes RetryError once the session adapter exhausts its retries on 429/5xx
         return None
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def _fetch_court_complex_name(url):
+    """Fetch page title"""
+    response = safe_request(url)
+    if not response:
+        raise LookupError(f"Could not fetch {url}")
+    soup = BeautifulSoup(response.content, HTML_PARSER)
+    title = soup.find('title')
+    if title:
+        return title.get_text(strip=True)
+    return None
+
 def get_court_complex_name_from_url(url):
     """Extract court complex name from URL"""
     try:
-        response = safe_request(url)
-        if not response:
-            return None
-        soup = BeautifulSoup(response.content, 'html.parser')
-        title = soup.find('title')
-        if title:
-            return title.get_text(strip=True)
-        return None
-    except:
+        return _fetch_court_complex_name(url)
+    except (LookupError, ValueError, ParserRejectedMarkup):
+        # Fetch failure or unparseable page
         return None
 
+@st.cache_data(ttl=600, show_spinner=False)
+def _fetch_all_pdf_links():
+    """Fetch all PDF links on index page"""
+    # Revalidate against the last fetch so an unchanged page returns 304
+    with INDEX_CACHE_LOCK:
+        cached = INDEX_CACHE.get(DELHI_CAUSELIST_URL)
+    conditional_headers = {}
+    if cached:
+        if cached['etag']:
+            conditional_headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            conditional_headers['If-Modified-Since'] = cached['last_modified']
+    
+    response = safe_request(DELHI_CAUSELIST_URL, extra_headers=conditional_headers)
+    if not response:
+        return ()
+    
+    if response.status_code == 304 and cached:
+        return cached['links']
+    
+    soup = BeautifulSoup(response.content, HTML_PARSER, parse_only=ONLY_A)
+    pdf_links = []
+    
+    # Find all PDF links
+    for link in soup.find_all('a', href=PDF_HREF_RE):
+        href = link.get('href', '').strip()
+        if not href:
+            continue
+        
+        # Make absolute URL
+        if href.startswith('http'):
+            full_url = href
+        else:
+            full_url = DELHI_BASE_URL + href if href.startswith('/') else DELHI_BASE_URL + '/' + href
+        
+        link_text = link.get_text(strip=True)
+        if link_text:
+            pdf_links.append((link_text, full_url))
+    
+    pdf_links = tuple(pdf_links)
+    if pdf_links:
+        with INDEX_CACHE_LOCK:
+            INDEX_CACHE[DELHI_CAUSELIST_URL] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'links': pdf_links
+            }
+    return pdf_links
+
 def get_pdf_links_for_court_and_date(date_obj, court_complex=None):
     """Fetch all PDF links for selected court complex and date"""
     try:
-        response = safe_request(DELHI_CAUSELIST_URL)
-        if not response:
+        all_links = _fetch_all_pdf_links()
+        if not all_links:
+            # Don't keep a failed/empty fetch cached for the whole TTL
+            _fetch_all_pdf_links.clear()
             return []
         
-        soup = BeautifulSoup(response.content, 'html.parser')
         pdf_links = []
-        
-        # Find all PDF links
-        for link in soup.find_all('a', href=re.compile(r'\.pdf', re.I)):
-            href = link.get('href', '').strip()
-            if not href:
+        seen = set()
+        for link_text, full_url in all_links:
+            # Filter by court complex if specified
+            if court_complex and court_complex.lower() not in link_text.lower():
                 continue
             
-            # Make absolute URL
-            if href.startswith('http'):
-                full_url = href
-            else:
-                full_url = DELHI_BASE_URL + href if href.startswith('/') else DELHI_BASE_URL + '/' + href
+            # Same PDF is often linked more than once on the index page
+            if full_url in seen:
+                continue
+            seen.add(full_url)
             
-            link_text = link.get_text(strip=True)
-            if link_text:
-                # Filter by court complex if specified
-                if court_complex and court_complex.lower() not in link_text.lower():
-                    continue
-                
-                pdf_links.append({
-                    'name': link_text,
-                    'url': full_url,
-                    'judge': link_text  # Assuming link text contains judge/establishment name
-                })
+            pdf_links.append({
+                'name': link_text,
+                'url': full_url,
+                'judge': link_text  # Assuming link text contains judge/establishment name
+            })
         
         return pdf_links
     
@@ -94,22 +196,70 @@ def get_pdf_links_for_court_and_date(date_obj, court_complex=None):
         st.error(f"Error fetching PDFs: {str(e)}")
         return []
 
+def _is_complete_pdf(filepath):
+    """Check PDF is complete"""
+    try:
+        size = os.path.getsize(filepath)
+        if size <= 1000:
+            return False
+        # Also rejects truncated files left by older non-atomic downloads
+        with open(filepath, 'rb') as f:
+            f.seek(max(0, size - 1024))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
 def download_pdf(pdf_url, filename):
     """Download single PDF"""
+    filepath = os.path.join("downloaded_pdfs", filename)
+    part_path = None
+    
+    # Already downloaded on a previous run (writes are atomic via .part + os.replace)
+    if _is_complete_pdf(filepath):
+        return filepath
+    
     try:
-        response = safe_request(pdf_url, timeout=20)
-        if not response:
-            return None
+        with DOWNLOAD_SLOTS:
+            response = safe_request(pdf_url, timeout=20, stream=True)
+            if not response:
+                return None
+            
+            # Reject error pages / tiny bodies from headers before reading any payload
+            content_type = response.headers.get('Content-Type', '')
+            content_length = response.headers.get('Content-Length')
+            if content_type.startswith('text/') or (content_length and int(content_length) <= 1000):
+                response.close()
+                return None
+            
+            # Stream to a unique temp file so memory stays bounded regardless of
+            # PDF size, a failed download never clobbers an existing good copy,
+            # and concurrent downloads of the same file don't share a temp path
+            total_bytes = 0
+            fd, part_path = tempfile.mkstemp(dir="downloaded_pdfs", suffix=".part")
+            with response, os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(65536):
+                    f.write(chunk)
+                    total_bytes += len(chunk)
         
-        if response.status_code == 200 and len(response.content) > 1000:
-            filepath = os.path.join("downloaded_pdfs", filename)
-            with open(filepath, 'wb') as f:
-                f.write(response.content)
+        # Fallback size check for responses without Content-Length
+        if total_bytes > 1000:
+            os.replace(part_path, filepath)
             return filepath
+        os.remove(part_path)
         return None
-    except:
+    except (requests.RequestException, OSError, ValueError):
+        # Dropped stream mid-body, disk error, or malformed Content-Length
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
         return None
 
+def _download_judge_pdf(idx, pdf_link, filename):
+    """Download worker"""
+    filepath = os.path.join("downloaded_pdfs", filename)
+    if _is_complete_pdf(filepath):
+        return idx, filepath, filename, pdf_link['judge'], True
+    return idx, download_pdf(pdf_link['url'], filename), filename, pdf_link['judge'], False
+
 def download_all_judges_pdfs(date_obj, court_complex):
     """Download cause lists for ALL judges in selected court complex"""
     try:
@@ -124,33 +274,53 @@ def download_all_judges_pdfs(date_obj, court_complex):
         st.info(f"Found {len(pdf_links)} judge(s) for {court_complex}")
         
         progress_bar = st.progress(0)
-        status_text = st.empty()
         
-        for idx, pdf_link in enumerate(pdf_links):
-            judge_name = pdf_link['judge']
-            status_text.text(f"Downloading {idx + 1}/{len(pdf_links)}: {judge_name[:50]}")
-            
-            # Create safe filename
-            safe_judge = re.sub(r'[^\w\s-]', '', judge_name)[:40]
-            filename = f"CauseList_{court_complex}_{safe_judge}_{date_str}.pdf"
-            
-            # Download
-            filepath = download_pdf(pdf_link['url'], filename)
-            
+        # Create safe filenames up front; truncated judge names can collide,
+        # so tag each with a short hash of its (deduplicated) URL
+        jobs = []
+        for pdf_link in pdf_links:
+            safe_judge = SAFE_NAME_RE.sub('', pdf_link['judge'])[:40]
+            url_tag = hashlib.sha1(pdf_link['url'].encode()).hexdigest()[:8]
+            filename = f"CauseList_{court_complex}_{safe_judge}_{url_tag}_{date_str}.pdf"
+            jobs.append((pdf_link, filename))
+        
+        # Download in parallel; only the progress bar updates per file
+        total = len(jobs)
+        results = [None] * total
+        executor = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS)
+        try:
+            futures = [
+                executor.submit(_download_judge_pdf, idx, pdf_link, filename)
+                for idx, (pdf_link, filename) in enumerate(jobs)
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                idx, filepath, filename, judge_name, skipped = future.result()
+                results[idx] = (filepath, filename, judge_name, skipped)
+                progress_bar.progress(done / total)
+        finally:
+            # On a rerun/stop, drop queued downloads instead of waiting for them
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        progress_bar.empty()
+        
+        # Report in page order, not completion order
+        messages = []
+        for filepath, filename, judge_name, skipped in results:
             if filepath:
                 downloaded_files.append({
                     'judge': judge_name,
                     'filepath': filepath,
                     'filename': filename
                 })
-                st.success(f"Downloaded: {filename}")
+                if skipped:
+                    messages.append(f"- 📁 Already on disk: {filename}")
+                else:
+                    messages.append(f"- ✅ Downloaded: {filename}")
             else:
-                st.warning(f"Failed to download: {judge_name}")
-            
-            progress_bar.progress((idx + 1) / len(pdf_links))
+                messages.append(f"- ⚠️ Failed to download: {judge_name}")
         
-        status_text.empty()
-        progress_bar.empty()
+        # Report all results in one render instead of one widget per file
+        st.markdown("\n".join(messages))
         
         return downloaded_files
     
@@ -212,17 +382,18 @@ with col1:
 with col2:
     st.subheader("Downloads")
     try:
-        files = os.listdir("downloaded_pdfs")
+        # Single directory scan; DirEntry caches stat info
+        with os.scandir("downloaded_pdfs") as it:
+            files = [entry for entry in it if entry.is_file() and not entry.name.endswith('.part')]
         if files:
             st.metric("Files Downloaded", len(files))
             with st.expander("Recent Files"):
-                for file in sorted(files, reverse=True)[:8]:
-                    filepath = os.path.join("downloaded_pdfs", file)
-                    size = os.path.getsize(filepath) / 1024
-                    st.write(f"📄 {file}\n({size:.1f} KB)")
+                for entry in heapq.nlargest(8, files, key=lambda e: e.name):
+                    size = entry.stat().st_size / 1024
+                    st.write(f"📄 {entry.name}\n({size:.1f} KB)")
         else:
             st.info("No downloads yet")
-    except:
+    except OSError:
         st.info("Ready to download")
 
 # ============ INFO ============